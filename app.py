@@ -1,14 +1,53 @@
 
-import os, io
+import os, io, html, hmac, json, time, atexit, hashlib, threading
 from datetime import datetime, date
 from typing import Dict, List
+import numpy as np
 import pandas as pd
 import streamlit as st
+import xlsxwriter
+import streamlit.components.v1 as components
+
+# Optional PDF export (requires 'reportlab' in requirements; otherwise the Print tab hides the PDF button)
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    _PDF_OK = True
+except Exception:
+    _PDF_OK = False
+
+# Arrow-backed strings (pyarrow ships with streamlit) so key/status comparisons run in Arrow kernels
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+    _ARROW_OK = True
+except Exception:
+    STRING_DTYPE = "string"
+    _ARROW_OK = False
+
+# Optional Rust xlsx reader (pip install python-calamine); openpyxl in read-only mode otherwise
+try:
+    import python_calamine  # noqa: F401
+    _READ_ENGINE = {"engine": "calamine"}
+except Exception:
+    _READ_ENGINE = {"engine": "openpyxl", "engine_kwargs": {"read_only": True, "data_only": True}}
+
+# Copy-on-write: slices/filters share buffers until written, so defensive .copy() calls are unnecessary
+# (always on from pandas 3, where the option is gone)
+try:
+    pd.set_option("mode.copy_on_write", True)
+except Exception:
+    pass
 
 st.set_page_config(page_title="Fire Incident Reports", page_icon="📝", layout="wide")
 
 DEFAULT_FILE = os.path.join(os.path.dirname(__file__), "fire_incident_db.xlsx")
 PRIMARY_KEY = "IncidentNumber"
+GRID_PREVIEW_ROWS = 200
+AUTOSAVE_DEBOUNCE_S = 2.0
 
 CHILD_TABLES = {
     "Incident_Times": ["IncidentNumber","Alarm","Enroute","Arrival","Clear"],
@@ -18,7 +57,10 @@ CHILD_TABLES = {
 }
 PERSONNEL_SCHEMA = ["PersonnelID","Name","UnitNumber","Rank","Badge","Phone","Email","Address","City","State","PostalCode","Certifications","Active","FirstName","LastName","FullName"]
 APPARATUS_SCHEMA = ["ApparatusID","UnitNumber","CallSign","UnitType","GPM","TankSize","SeatingCapacity","Station","Active","Name"]
-USERS_SCHEMA = ["Username","Password","Role","FullName","Active",
+INCIDENTS_SCHEMA = [PRIMARY_KEY,"IncidentDate","IncidentTime","IncidentType","ResponsePriority","AlarmLevel","Shift",
+                    "LocationName","Address","City","State","PostalCode","Latitude","Longitude",
+                    "Narrative","Status","CreatedBy","SubmittedAt","ReviewedBy","ReviewedAt","ReviewerComments"]
+USERS_SCHEMA = ["Username","Password","PasswordHash","Role","FullName","Active",
                 "CanWrite","CanEditOwn","CanEditAll","CanReview","CanApprove","CanManageUsers","CanEditRosters","CanPrint"]
 
 LOOKUP_SHEETS = {
@@ -39,63 +81,401 @@ ROLE_PRESETS = {
 
 def load_workbook(path: str) -> Dict[str, pd.DataFrame]:
     try:
-        xls = pd.ExcelFile(path)
-        return {name.strip(): xls.parse(name) for name in xls.sheet_names}
+        # keys (and password digests) are read as text: a numeric-looking column would otherwise come back as float ("5.0")
+        with pd.ExcelFile(path, **_READ_ENGINE) as xls:
+            return {name.strip(): xls.parse(name, dtype={PRIMARY_KEY: str, "PasswordHash": str}) for name in xls.sheet_names}
     except Exception as e:
         st.error(f"Failed to load workbook: {e}")
         return {}
 
+def file_stamp(path: str):
+    # (mtime_ns, size): a save/upload always changes it, even within one coarse mtime tick
+    if not os.path.exists(path):
+        return None
+    info = os.stat(path)
+    return (info.st_mtime_ns, info.st_size)
+
+# --- parquet sidecar: a columnar mirror of the last workbook this app wrote, read instead of re-parsing the xlsx ---
+def sidecar_dir(path: str) -> str:
+    return path + ".parquet.d"
+
+_SIDECAR_LOCK = threading.Lock()
+
+def write_sidecar(dfs: Dict[str, pd.DataFrame], path: str, stamp):
+    # `stamp` is the xlsx version these frames came from, captured by the caller before any slow work;
+    # the manifest goes last and is skipped if the xlsx has been replaced since, so a mirror never claims
+    # a newer file. Any failure just leaves loads on the xlsx.
+    d = sidecar_dir(path); manifest = os.path.join(d, "manifest.json")
+    with _SIDECAR_LOCK:
+        try:
+            os.makedirs(d, exist_ok=True)
+            if os.path.exists(manifest): os.remove(manifest)
+            if stamp is None:
+                return
+            for sheet, df in dfs.items():
+                df.to_parquet(os.path.join(d, f"{sheet}.parquet"), index=False)
+            if file_stamp(path) != tuple(stamp):
+                return
+            with open(manifest, "w") as f:
+                json.dump({"stamp": list(stamp), "sheets": list(dfs)}, f)
+        except Exception:
+            pass
+
+def read_sidecar(path: str):
+    # None unless the sidecar was written for exactly the xlsx that is on disk now
+    manifest = os.path.join(sidecar_dir(path), "manifest.json")
+    if not _ARROW_OK or not os.path.exists(manifest):
+        return None
+    try:
+        with open(manifest) as f: m = json.load(f)
+        if tuple(m["stamp"]) != file_stamp(path):
+            return None
+        return {s: pd.read_parquet(os.path.join(sidecar_dir(path), f"{s}.parquet")) for s in m["sheets"]}
+    except Exception:
+        return None
+
+def _text_to_string(df: pd.DataFrame) -> None:
+    # object columns holding only text become STRING_DTYPE (Arrow buffers when available); mixed/empty columns are left alone
+    for c in df.columns:
+        if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) == "string":
+            df[c] = df[c].astype(STRING_DTYPE)
+
+@st.cache_data(show_spinner=False)
+def load_normalized(path: str, mtime) -> Dict[str, pd.DataFrame]:
+    return read_normalized(path, mtime)
+
+def read_normalized(path: str, mtime) -> Dict[str, pd.DataFrame]:
+    # uncached body of load_normalized (the autosave thread re-reads through it before merging)
+    # mtime (a file_stamp taken by the caller before this parse) stamps the sidecar written below
+    d = read_sidecar(path)
+    if d is None:
+        d = load_workbook(path)
+        if d and _ARROW_OK: write_sidecar(d, path, mtime)  # uploaded/hand-edited workbooks pay the xlsx parse once
+    for df in d.values():
+        for col in ("Status", PRIMARY_KEY, "CreatedBy"):
+            if col in df.columns:
+                df[col] = df[col].astype(STRING_DTYPE)
+    # schema + roster repair happen once per file version here, not on every rerun;
+    # tables are column-complete from here on and the tabs read data[t] directly
+    ensure_table(d, "Incidents", INCIDENTS_SCHEMA)
+    ensure_table(d, "Personnel", PERSONNEL_SCHEMA)
+    ensure_table(d, "Apparatus", APPARATUS_SCHEMA)
+    for t, cols in CHILD_TABLES.items(): ensure_table(d, t, cols)
+    repair_rosters(d)
+    for sheet in ("Personnel", "Apparatus"):  # roster text feeds the name/unit string pipelines on every rerun
+        if sheet in d:
+            _text_to_string(d[sheet])
+    return d
+
+@st.cache_data(show_spinner=False)
+def sheet_names(path: str, mtime) -> List[str]:
+    d = read_sidecar(path)
+    if d is not None:
+        return list(d)
+    with pd.ExcelFile(path, **_READ_ENGINE) as xls:
+        return xls.sheet_names
+
+# workbooks are written straight through xlsxwriter: pandas' to_excel builds an ExcelCell + style dict per cell.
+# String cells are written as-is (no URL/formula/number sniffing; "=..." text never becomes a formula);
+# inf/-inf floats become #DIV/0! cells instead of raising (to_excel never failed on them).
+XLSX_OPTIONS = {"strings_to_urls": False, "strings_to_formulas": False, "strings_to_numbers": False, "nan_inf_to_errors": True}
+
+def write_xlsx(dfs: Dict[str, pd.DataFrame], target):
+    wb = xlsxwriter.Workbook(target, {**XLSX_OPTIONS, "in_memory": True})
+    header = wb.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    fmts = {datetime: wb.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"}), date: wb.add_format({"num_format": "yyyy-mm-dd"})}
+    for sheet, df in dfs.items():
+        ws = wb.add_worksheet(sheet)
+        ws.write_row(0, 0, [str(c) for c in df.columns], header)
+        for j, c in enumerate(df.columns):
+            col = df[c]
+            for i, v in enumerate(col.astype(object).where(col.notna(), None).tolist(), start=1):
+                if v is None:
+                    continue
+                if isinstance(v, date):  # datetime/Timestamp are date subclasses
+                    fmt = fmts[datetime] if isinstance(v, datetime) else fmts[date]
+                    ws.write_datetime(i, j, v.to_pydatetime() if isinstance(v, pd.Timestamp) else v, fmt)
+                elif isinstance(v, (str, int, float)):
+                    ws.write(i, j, v)
+                else:
+                    ws.write_string(i, j, str(v))
+    wb.close()  # only a complete workbook is ever written to target
+
 def save_workbook_to_bytes(dfs: Dict[str, pd.DataFrame]) -> bytes:
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        for sheet, df in dfs.items():
-            df.to_excel(writer, sheet_name=sheet, index=False)
-    buf.seek(0)
-    return buf.read()
+    write_xlsx(dfs, buf)
+    return buf.getvalue()
+
+def atomic_write(path: str, write):
+    # write beside the target and swap it in, so a reader (or a crash mid-save) never sees a half-written workbook;
+    # returns the file_stamp of what this call published (a rename keeps mtime/size), not whatever is there later
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        fd = os.open(tmp, os.O_RDONLY)
+        try: os.fsync(fd)  # data on disk before the rename publishes it
+        finally: os.close(fd)
+        stamp = file_stamp(tmp)
+        os.replace(tmp, path)
+        return stamp
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+
+def write_bytes(path: str, payload: bytes) -> None:
+    def _write(target):
+        with open(target, "wb") as f: f.write(payload)
+    atomic_write(path, _write)
 
 def save_to_path(dfs: Dict[str, pd.DataFrame], path: str):
     try:
-        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
-            for sheet, df in dfs.items():
-                df.to_excel(writer, sheet_name=sheet, index=False)
-        return True, None
+        stamp = atomic_write(path, lambda tmp: write_xlsx(dfs, tmp))
     except Exception as e:
         return False, str(e)
+    if _ARROW_OK: write_sidecar(dfs, path, stamp)
+    return True, None
+
+def _key_signatures(df: pd.DataFrame, cols: List[str]) -> dict:
+    # one hash per IncidentNumber over its rows, compared as text so dtype drift between loads isn't an edit
+    if df.empty:
+        return {}
+    t = df.reindex(columns=cols).astype("string").fillna("")
+    rows = pd.util.hash_pandas_object(t, index=False)
+    return rows.groupby(t[PRIMARY_KEY].to_numpy(), sort=False).sum().to_dict()
+
+def merge_keyed(theirs: pd.DataFrame, mine: pd.DataFrame, base: pd.DataFrame) -> pd.DataFrame:
+    # three-way merge by incident: keys this session added, changed or deleted since `base` take its rows,
+    # every other key keeps what is on disk now. On-disk order is kept: a changed key's rows go where its
+    # first row on disk was, and only keys the file doesn't have are appended.
+    cols = list(dict.fromkeys([PRIMARY_KEY, *base.columns, *mine.columns]))
+    b, m = _key_signatures(base, cols), _key_signatures(mine, cols)
+    changed = {k for k in b.keys() | m.keys() if b.get(k) != m.get(k)}
+    if not changed:
+        return theirs
+    tk = theirs[PRIMARY_KEY].astype("string").fillna("").reset_index(drop=True)
+    mk = mine[PRIMARY_KEY].astype("string").fillna("").reset_index(drop=True)
+    hit, ours = tk.isin(changed).to_numpy(), mk.isin(changed).to_numpy()
+    first = hit & ~tk.duplicated().to_numpy()
+    slot = dict(zip(tk[first], np.flatnonzero(first)))
+    mine_order = np.array(mk[ours].map(slot), dtype=float)  # a writable copy (to_numpy may be a read-only view)
+    new = np.isnan(mine_order)
+    mine_order[new] = len(tk) + np.arange(new.sum())
+    order = np.concatenate([np.flatnonzero(~hit), mine_order])
+    out = append_rows(theirs[~hit].reset_index(drop=True), mine[ours])
+    return out.iloc[np.argsort(order, kind="stable")].reset_index(drop=True)
+
+def merge_workbook(theirs: Dict[str, pd.DataFrame], mine: Dict[str, pd.DataFrame],
+                   base: Dict[str, pd.DataFrame], sheets) -> Dict[str, pd.DataFrame]:
+    # sheets this session didn't touch stay as on disk; keyed sheets merge by incident; other touched sheets are its copy
+    out = dict(theirs)
+    for sheet in sheets:
+        if sheet not in mine:
+            continue
+        t, b = theirs.get(sheet), base.get(sheet)
+        keyed = t is not None and b is not None and all(PRIMARY_KEY in df.columns for df in (t, b, mine[sheet]))
+        out[sheet] = merge_keyed(t, mine[sheet], b) if keyed else mine[sheet]
+    return out
+
+def save_merged(dfs: Dict[str, pd.DataFrame], path: str, base, sheets):
+    # `base` is the (stamp, frames) a session's edits started from. If the file was replaced since (another
+    # session, an upload, a hand edit), re-read it and lay only this session's edited sheets on top.
+    stamp = file_stamp(path)
+    if base is not None and stamp is not None and stamp != tuple(base[0]):
+        try:
+            dfs = merge_workbook(read_normalized(path, stamp), dfs, base[1], sheets)
+        except Exception as e:  # reported like a failed write; the autosave thread must not die on it
+            return False, f"merge with {path} failed: {e}"
+    return save_to_path(dfs, path)
+
+# --- autosave: edits mark the session dirty; a background thread writes the latest snapshot per file ---
+class BackgroundSaver:
+    # one daemon thread per server process. Jobs are keyed per (path, session): a newer snapshot replaces only
+    # that session's queued one, and each session only ever sees the result of its own write. Every workbook
+    # write, queued or explicit, goes through write() so two never interleave.
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._jobs: Dict[tuple, tuple] = {}   # (path, session) -> (ticket, dfs, base, sheets)
+        self._done: Dict[tuple, tuple] = {}   # (path, session) -> (ticket, ok, err)
+        self._busy = set()                    # (path, session) keys popped but not yet written
+        self._ticket = 0
+        threading.Thread(target=self._run, daemon=True, name="autosave").start()
+        atexit.register(self._drain)  # a server shutdown writes queued snapshots instead of dropping them
+
+    def write(self, save, *args):
+        with self._write_lock:
+            return save(*args)
+
+    def schedule(self, dfs: Dict[str, pd.DataFrame], path: str, session: str, base, sheets) -> int:
+        with self._cond:
+            self._ticket += 1
+            self._jobs[(path, session)] = (self._ticket, dfs, base, sheets)
+            self._cond.notify_all()
+            return self._ticket
+
+    def result(self, path: str, session: str, ticket: int):
+        # (ticket, ok, err) once this session's snapshot `ticket` (or a newer one of its own) was written, else None
+        with self._cond:
+            done = self._done.get((path, session))
+        return done if done and done[0] >= ticket else None
+
+    def cancel(self, path: str, session: str):
+        # drop this session's queued snapshot and wait out its in-flight write (an explicit save supersedes it)
+        key = (path, session)
+        with self._cond:
+            self._jobs.pop(key, None)
+            while key in self._busy:
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait()
+            time.sleep(self.delay)  # coalesce bursts of edits into one write
+            self._drain()
+
+    def _drain(self):
+        # write everything queued so far, oldest ticket first
+        with self._cond:
+            keys = sorted(self._jobs, key=lambda k: self._jobs[k][0])
+        for key in keys:
+            with self._cond:
+                if key not in self._jobs:
+                    continue
+                ticket, dfs, base, sheets = self._jobs.pop(key)
+                self._busy.add(key)
+            ok, err = self.write(save_merged, dfs, key[0], base, sheets)
+            with self._cond:
+                self._done[key] = (ticket, ok, err)
+                self._busy.discard(key)
+                self._cond.notify_all()
+
+@st.cache_resource
+def get_saver() -> BackgroundSaver:
+    return BackgroundSaver(AUTOSAVE_DEBOUNCE_S)
+
+def session_id() -> str:
+    # autosave jobs and results belong to one browser session
+    return st.session_state.setdefault("_session_id", os.urandom(8).hex())
+
+def bump_version():
+    # any change to which frames `data` holds invalidates the workbook_state_key memos, even at the same file stamp
+    st.session_state["_workbook_version"] = st.session_state.get("_workbook_version", 0) + 1
+
+def mark_dirty(*sheets: str):
+    st.session_state["_dirty"] = True
+    st.session_state.setdefault("_dirty_sheets", set()).update(sheets)
+    bump_version()
+
+def mark_clean():
+    # the next rerun reloads the file: a merged save may have moved rows since the memos were built
+    st.session_state["_dirty"] = False
+    st.session_state["_dirty_sheets"] = set()
+    st.session_state.pop("_save_job", None)
+    bump_version()
+
+def session_base(path: str):
+    # (stamp, frames) of the clean load this session's edits started from, if it was of `path`
+    base = st.session_state.get("_base")
+    return base[1:] if base and base[0] == path else None
+
+def save_now(dfs: Dict[str, pd.DataFrame], path: str, *sheets: str):
+    # `sheets`: edited sheets the caller hasn't passed to mark_dirty (roster/user editors save directly)
+    saver = get_saver()
+    saver.cancel(path, session_id())
+    sheets = set(st.session_state.get("_dirty_sheets", ())) | set(sheets)
+    ok, err = saver.write(save_merged, dfs, path, session_base(path), sheets)
+    if ok:
+        mark_clean()
+    return ok, err
+
+def workbook_state_key(path: str) -> tuple:
+    # per-session memo key: the file stamp covers saved state, the version counter covers unsaved edits and
+    # every switch between the session's own frames and a fresh load
+    return (path, file_stamp(path), st.session_state.get("_workbook_version", 0))
+
+def session_memo(slot: str, key, build):
+    # one cached value per session slot, rebuilt only when its key changes (typically workbook_state_key)
+    cached = st.session_state.get(slot)
+    if cached is None or cached[0] != key:
+        cached = (key, build())
+        st.session_state[slot] = cached
+    return cached[1]
+
+@st.cache_data(show_spinner="Building Excel...", max_entries=2)
+def export_bytes_for_stamp(path: str, stamp, _dfs: Dict[str, pd.DataFrame]) -> bytes:
+    # shared by every session: a clean session's data is a pure function of the file it was loaded from
+    return save_workbook_to_bytes(_dfs)
+
+def export_bytes(dfs: Dict[str, pd.DataFrame], path: str) -> bytes:
+    if not st.session_state.get("_dirty"):
+        return export_bytes_for_stamp(path, file_stamp(path), dfs)
+    return session_memo("_export_cache", workbook_state_key(path), lambda: save_workbook_to_bytes(dfs))
+
+def flush_autosave(dfs: Dict[str, pd.DataFrame], path: str):
+    if not st.session_state.get("_dirty"):
+        return
+    changed = ", ".join(sorted(st.session_state.get("_dirty_sheets", ()))) or "workbook"
+    if not st.session_state.get("autosave", True):
+        st.sidebar.caption(f"✏️ Unsaved changes ({changed}) — use Export → Overwrite Source File Now.")
+        return
+    saver, version = get_saver(), st.session_state.get("_workbook_version", 0)
+    job = st.session_state.get("_save_job")  # (path, ticket, version) of the last snapshot handed to the saver
+    if job is None or job[0] != path or job[2] != version:
+        # shallow copies are safe snapshots under copy-on-write: later in-place edits copy first
+        ticket = saver.schedule({k: v.copy(deep=False) for k, v in dfs.items()}, path, session_id(),
+                                session_base(path), set(st.session_state.get("_dirty_sheets", ())))
+        st.session_state["_save_job"] = job = (path, ticket, version)
+    res = saver.result(path, session_id(), job[1])
+    if res is None:
+        st.sidebar.caption(f"⏳ Unsaved changes ({changed}) — autosave pending.")
+    elif res[1]:
+        mark_clean()
+    else:
+        st.sidebar.error(f"Autosave failed: {res[2]}")
+        st.session_state.pop("_save_job", None)  # retry on the next rerun
 
 def ensure_columns(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
     if df is None:
         df = pd.DataFrame()
-    for c in cols:
-        if c not in df.columns:
-            df[c] = pd.NA
+    missing = [c for c in dict.fromkeys(cols) if c not in df.columns]
+    if missing:  # one block insert instead of a column-at-a-time setitem
+        df[missing] = pd.DataFrame(pd.NA, index=df.index, columns=missing, dtype=object)
     return df
 
 # --- ID lookup helpers (used when adding roster selections to an incident) ---
-def _lookup_personnel_id(personnel_df: pd.DataFrame, name: str):
-    if personnel_df is None or personnel_df.empty:
-        return pd.NA
-    if "Name" in personnel_df.columns:
-        m = personnel_df[personnel_df["Name"].astype(str) == str(name)]
-        if not m.empty and "PersonnelID" in m.columns:
-            return m.iloc[0]["PersonnelID"]
-    # fallback: try FirstName/LastName and Rank combined if needed
-    return pd.NA
-
-def _lookup_apparatus_id(app_df: pd.DataFrame, unit_value: str):
-    if app_df is None or app_df.empty:
-        return pd.NA
-    u = str(unit_value)
+# one pass per roster column for the whole selection instead of a filtered scan per picked name
+def _first_ids(df: pd.DataFrame, col: str, id_col: str) -> dict:
+    first = df[[col, id_col]].drop_duplicates(col)
+    return dict(zip(first[col].astype(str), first[id_col]))
+
+def _lookup_personnel_ids(personnel_df: pd.DataFrame, names: List[str]) -> list:
+    if personnel_df is None or personnel_df.empty or "Name" not in personnel_df.columns or "PersonnelID" not in personnel_df.columns:
+        return [pd.NA] * len(names)
+    ids = _first_ids(personnel_df, "Name", "PersonnelID")
+    return [ids.get(str(n), pd.NA) for n in names]
+
+def _lookup_apparatus_ids(app_df: pd.DataFrame, units: List[str]) -> list:
+    out = [pd.NA] * len(units)
+    if app_df is None or app_df.empty or "ApparatusID" not in app_df.columns:
+        return out
+    unresolved = set(range(len(units)))
     # try matching by Name, CallSign, UnitNumber (in that order)
     for col in ["Name", "CallSign", "UnitNumber", "Unit"]:
-        if col in app_df.columns:
-            m = app_df[app_df[col].astype(str) == u]
-            if not m.empty and "ApparatusID" in m.columns:
-                return m.iloc[0]["ApparatusID"]
-    return pd.NA
+        if col not in app_df.columns or not unresolved:
+            continue
+        ids = _first_ids(app_df, col, "ApparatusID")
+        for i in list(unresolved):
+            if str(units[i]) in ids:
+                out[i] = ids[str(units[i])]; unresolved.discard(i)
+    return out
 
 def ensure_table(data: Dict[str, pd.DataFrame], name: str, cols: List[str]):
     data[name] = ensure_columns(data.get(name, pd.DataFrame()), cols)
 
+# option builders are cached on their input frames (st.cache_data hashes them), so a rerun skips the per-cell strip/sort
+@st.cache_data(show_spinner=False)
 def get_lookups(data: Dict[str, pd.DataFrame]) -> Dict[str, List[str]]:
     out: Dict[str, List[str]] = {}
     for sheet, col in LOOKUP_SHEETS.items():
@@ -104,93 +484,283 @@ def get_lookups(data: Dict[str, pd.DataFrame]) -> Dict[str, List[str]]:
             out[col] = data[sheet][header].dropna().astype(str).tolist()
     return out
 
-def upsert_row(df: pd.DataFrame, row: dict, key=PRIMARY_KEY) -> pd.DataFrame:
+def append_rows(df: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    # new rows take the table's Arrow string dtypes, so one append doesn't demote key/Status columns to object
+    casts = {c: df[c].dtype for c in new.columns if c in df.columns and isinstance(df[c].dtype, pd.StringDtype)}
+    new = new.astype(casts) if casts else new
+    if df.empty:  # nothing to keep but the schema (and concat's all-NA dtype inference is deprecated)
+        return new.reindex(columns=list(dict.fromkeys([*df.columns, *new.columns]))).reset_index(drop=True)
+    return pd.concat([df, new], ignore_index=True)
+
+def _fits(dtype, v) -> bool:
+    # can a scalar be written into a numpy-typed column without pandas upcasting it (a FutureWarning, an error in pandas 3)
+    kind, na = dtype.kind, pd.api.types.is_scalar(v) and pd.isna(v)
+    if isinstance(dtype, pd.StringDtype):
+        return na or isinstance(v, str)
+    if kind in "iub":
+        return not na and (pd.api.types.is_bool(v) if kind == "b" else pd.api.types.is_integer(v))
+    if kind == "f":
+        return na or (pd.api.types.is_number(v) and not pd.api.types.is_bool(v))
+    if kind == "M":
+        return na or isinstance(v, (datetime, np.datetime64))
+    return True
+
+def set_fields(df: pd.DataFrame, labels, fields: dict) -> pd.DataFrame:
+    # scalar .at writes per cell; a column that can't hold a value becomes object first
+    for k, v in fields.items():
+        if k not in df.columns: df[k] = pd.NA
+        if not _fits(df[k].dtype, v): df[k] = df[k].astype(object)
+        for label in labels:
+            df.at[label, k] = v
+    return df
+
+def upsert_row(df: pd.DataFrame, row: dict, key=PRIMARY_KEY, groups: dict = None) -> pd.DataFrame:
+    # groups: optional key -> positions map (key_groups) that is current for df; saves the key-column scan
     df = ensure_columns(df, list(row.keys()) + [key])
-    if key not in df.columns:
-        df[key] = pd.NA
-    keys = df[key].astype(str) if not df.empty else pd.Series([], dtype=str)
-    if str(row.get(key)) in keys.values:
-        idx = df.index[keys == str(row[key])]
-        for k, v in row.items():
-            if k not in df.columns: df[k] = pd.NA
-            df.loc[idx, k] = v
+    if groups is not None:
+        pos = groups.get(str(row.get(key)), [])
+    else:
+        pos = key_mask(df, row.get(key), key).to_numpy().nonzero()[0]
+    if len(pos):
+        set_fields(df, df.index[pos], row)
     else:
-        for k in row.keys():
-            if k not in df.columns: df[k] = pd.NA
-        df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+        df = append_rows(df, pd.DataFrame([row]))
     return df
 
-def _name_rank_first_last(row: pd.Series) -> str:
-    fn = str(row.get("FirstName") or "").strip()
-    ln = str(row.get("LastName") or "").strip()
-    rk = str(row.get("Rank") or "").strip()
-    parts = [p for p in [rk, fn, ln] if p]
-    return " ".join(parts).strip()
+# --- key-indexed views (built once per rerun; hash lookups instead of an astype(str) scan per selection) ---
+def key_groups(df: pd.DataFrame, key=PRIMARY_KEY) -> dict:
+    # key -> row positions; a lookup is then one iloc gather instead of a full boolean scan
+    return df.groupby(df[key].astype(STRING_DTYPE), sort=False).indices
+
+def child_groups(dfs: Dict[str, pd.DataFrame], path: str) -> Dict[str, dict]:
+    # child-table group maps shared by Approved/Print, rebuilt only when the workbook changes
+    return session_memo("_child_groups", workbook_state_key(path), lambda: {t: key_groups(dfs[t]) for t in CHILD_TABLES})
+
+def group_positions(df: pd.DataFrame, groups: dict, value, key=PRIMARY_KEY):
+    # positions from a memoized key map, re-found by a scan if they no longer hold `value`: a stale map must
+    # never read or patch another incident's rows
+    pos = groups.get(str(value), [])
+    if len(pos) and not df[key].iloc[pos].astype(STRING_DTYPE).eq(str(value)).all():
+        pos = key_mask(df, value, key).to_numpy().nonzero()[0]
+    return pos
+
+def rows_in_group(df: pd.DataFrame, groups: dict, value) -> pd.DataFrame:
+    return df.iloc[group_positions(df, groups, value)]
 
+def key_mask(df: pd.DataFrame, value, key=PRIMARY_KEY) -> pd.Series:
+    # one pass per table; callers reuse ~mask for the complement (NA keys never match)
+    return df[key].eq(str(value)).fillna(False).astype(bool)
+
+def record_for_key(df: pd.DataFrame, groups: dict, value) -> dict:
+    rows = rows_in_group(df, groups, value)
+    return rows.iloc[0].to_dict() if not rows.empty else {}
+
+def patch_incident(df: pd.DataFrame, groups: dict, value, **fields) -> pd.DataFrame:
+    # in-place .at update of the rows located through the key -> position map (every duplicate, like upsert_row)
+    pos = group_positions(df, groups, value)
+    return set_fields(df, df.index[pos], fields) if len(pos) else df
+
+def partition_by_status(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    status = df["Status"].astype(STRING_DTYPE).fillna("")
+    return {k: g for k, g in df.groupby(status, sort=False)}
+
+def incident_views(df: pd.DataFrame):
+    return key_groups(df), partition_by_status(df)
+
+def grid_preview(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    # large history grids ship only the first rows to the browser unless asked for all
+    if len(df) <= GRID_PREVIEW_ROWS:
+        return df
+    if st.checkbox(f"Show all {len(df)} rows", key=key):
+        return df
+    st.caption(f"Showing the first {GRID_PREVIEW_ROWS} of {len(df)} rows.")
+    return df.head(GRID_PREVIEW_ROWS)
+
+def arrow_grid(df: pd.DataFrame, path: str, tag: str):
+    # history grids: the pandas -> Arrow conversion st.dataframe would redo on every rerun is kept per workbook version
+    if not _ARROW_OK:
+        return df
+    def build():
+        try:
+            return pyarrow.Table.from_pandas(df, preserve_index=False)
+        except Exception:  # mixed-type object columns: let st.dataframe apply its own fallbacks
+            return df
+    return session_memo(f"_arrow_grid_{tag}", (workbook_state_key(path), tag, len(df)), build)
+
+_ESC = html.escape
+
+def table_html(df: pd.DataFrame) -> str:
+    # plain <table> for the print report; skips DataFrame.to_html's per-cell formatter
+    head = "".join(f"<th>{_ESC(str(c))}</th>" for c in df.columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{'' if pd.isna(v) else _ESC(str(v))}</td>" for v in row) + "</tr>"
+        for row in df.itertuples(index=False, name=None)
+    )
+    return f'<table border="1"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+def _txt(x) -> str:
+    return "" if x is None or (pd.api.types.is_scalar(x) and pd.isna(x)) else str(x)
+
+def readonly_text(label: str, value, height: int):
+    # static text in a scrolling box; a disabled text_area still round-trips widget state every rerun
+    st.caption(label)
+    with st.container(border=True, height=height):
+        st.text(_txt(value))
+
+def _as_date(v) -> date:
+    # widget default for a stored date cell; falls back to today for blanks or unparseable text
+    if v is None or (pd.api.types.is_scalar(v) and pd.isna(v)) or v == "":
+        return date.today()
+    if isinstance(v, datetime):  # also pd.Timestamp
+        return v.date()
+    if isinstance(v, date):
+        return v
+    try:
+        return date.fromisoformat(str(v)[:10])
+    except ValueError:
+        pass
+    try:
+        return pd.to_datetime(v).date()
+    except Exception:
+        return date.today()
+
+def report_pdf(sel, rec: dict, trow: dict, ip_view: pd.DataFrame, ia_view: pd.DataFrame) -> bytes:
+    # PDF twin of the Print tab's HTML report; Platypus wraps and paginates (long narratives/rosters flow onto new pages)
+    styles = getSampleStyleSheet(); body = styles["BodyText"]
+    g = lambda k: _ESC(_txt(rec.get(k)))  # Paragraph parses mini-markup, so text is escaped
+    t = lambda k: _ESC(_txt(trow.get(k)))
+    story = [
+        Paragraph(f"Incident #{_ESC(str(sel))}", styles["Heading2"]),
+        Paragraph(f"<b>Date/Time:</b> {g('IncidentDate')} {g('IncidentTime')}", body),
+        Paragraph(f"<b>Location:</b> {g('LocationName')} — {g('Address')} {g('City')} {g('State')} {g('PostalCode')}", body),
+        Paragraph(f"<b>Caller:</b> {g('CallerName') or 'N/A'} ({g('CallerPhone') or 'N/A'})", body),
+        Paragraph(f"<b>Report Writer:</b> {g('ReportWriter') or g('CreatedBy') or 'N/A'} &nbsp;&nbsp; <b>Approver:</b> {g('Approver') or g('ReviewedBy') or 'N/A'}", body),
+        Paragraph(f"<b>Times:</b> Alarm {t('Alarm')} | Enroute {t('Enroute')} | Arrival {t('Arrival')} | Clear {t('Clear')}", body),
+        Paragraph("Narrative", styles["Heading3"]),
+        Paragraph(g("Narrative").replace("\n", "<br/>"), body),
+    ]
+    width = LETTER[0] - inch
+    grid = TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.grey), ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"), ("VALIGN", (0, 0), (-1, -1), "TOP")])
+    for title, view, cols in (("Personnel on Scene", ip_view, ["Name","Role","Hours","RespondedIn"]),
+                              ("Apparatus on Scene", ia_view, ["Unit","UnitType","Role","Actions"])):
+        cols = [c for c in cols if c in view.columns]
+        story += [Spacer(1, 0.15*inch), Paragraph(title, styles["Heading3"])]
+        if cols:
+            rows = [[Paragraph(_ESC(_txt(v)), body) for v in row] for row in view[cols].itertuples(index=False, name=None)]
+            story.append(Table([cols] + rows, colWidths=[width / len(cols)] * len(cols), repeatRows=1, hAlign="LEFT", style=grid))
+    buf = io.BytesIO()
+    SimpleDocTemplate(buf, pagesize=LETTER, leftMargin=0.5*inch, rightMargin=0.5*inch, topMargin=0.5*inch, bottomMargin=0.5*inch,
+                      title=f"Incident {sel}").build(story)
+    return buf.getvalue()
+
+def _rank_first_last(df: pd.DataFrame) -> pd.Series:
+    # "Rank First Last" for every row at once (missing parts dropped, single spaces)
+    part = lambda c: df[c].fillna("").astype("string").str.strip() if c in df.columns else ""
+    return (part("Rank") + " " + part("FirstName") + " " + part("LastName")).str.replace(r"\s+", " ", regex=True).str.strip()
+
+def _clean_options(s: pd.Series) -> pd.Series:
+    # strip/blank-drop/dedupe in string kernels, first occurrence kept; the strip runs on the distinct values
+    # only (roster columns repeat a lot), the category-style trick without a categorical column
+    s = pd.Series(s.dropna().unique()).astype("string").str.strip()
+    return s[s != ""].drop_duplicates()
+
+@st.cache_data(show_spinner=False)
 def build_person_options(df: pd.DataFrame) -> list:
     if "Name" in df and df["Name"].notna().any():
-        s = df["Name"].astype(str)
+        s = df["Name"]
     elif "FullName" in df and df["FullName"].notna().any():
-        s = df["FullName"].astype(str)
+        s = df["FullName"]
     elif all(c in df.columns for c in ["FirstName","LastName","Rank"]):
-        s = df.apply(_name_rank_first_last, axis=1)
+        s = _rank_first_last(df)
     elif all(c in df.columns for c in ["FirstName","LastName"]):
-        s = (df["FirstName"].fillna("").astype(str).str.strip() + " " + df["LastName"].fillna("").astype(str).str.strip()).str.strip()
+        s = df["FirstName"].fillna("").astype("string").str.strip() + " " + df["LastName"].fillna("").astype("string").str.strip()
     else:
         s = pd.Series([], dtype=str)
-    vals = s.dropna().map(lambda x: x.strip()).replace("", pd.NA).dropna().unique().tolist()
-    return sorted(set(vals))
+    return sorted(_clean_options(s).tolist())
 
+@st.cache_data(show_spinner=False)
 def build_unit_options(df: pd.DataFrame) -> list:
     for col in ["UnitNumber","CallSign","Name"]:
         if col in df.columns and df[col].notna().any():
-            s = df[col].astype(str); break
+            s = df[col]; break
     else:
         s = pd.Series([], dtype=str)
-    vals = s.dropna().map(lambda x: x.strip()).replace("", pd.NA).dropna().unique().tolist()
-    return sorted(set(vals))
+    return sorted(_clean_options(s).tolist())
+
+def _blank(s: pd.Series) -> pd.Series:
+    return s.isna() | s.astype("string").str.strip().eq("").fillna(True)
 
 def repair_rosters(data: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
-    p = ensure_columns(data.get("Personnel", pd.DataFrame()), PERSONNEL_SCHEMA).copy()
+    p = ensure_columns(data.get("Personnel", pd.DataFrame()), PERSONNEL_SCHEMA)
+    if not p.empty:
+        mask_name_blank, mask_full_blank = _blank(p["Name"]), _blank(p["FullName"])
+        if mask_name_blank.any() or mask_full_blank.any():
+            synth = _rank_first_last(p).astype(object).where(lambda x: x != "")
+            p["Name"] = p["Name"].astype(object).where(~mask_name_blank, synth)
+            p["FullName"] = p["FullName"].astype(object).where(~mask_full_blank, synth)
     if "Rank" in p.columns and not p.empty:
-        p["Rank"] = p["Rank"].astype(str)  # free-text ranks
+        p["Rank"] = p["Rank"].astype(STRING_DTYPE)  # free-text ranks (blank stays NA, not "nan")
     if not p.empty:
-        mask_name_blank = p["Name"].isna() | (p["Name"].astype(str).str.strip()=="")
-        p.loc[mask_name_blank, "Name"] = p.loc[mask_name_blank].apply(_name_rank_first_last, axis=1)
-        mask_full_blank = p["FullName"].isna() | (p["FullName"].astype(str).str.strip()=="")
-        p.loc[mask_full_blank, "FullName"] = p.loc[mask_full_blank].apply(_name_rank_first_last, axis=1)
         if "Active" in p.columns:
-            m = p["Active"].isna() | (p["Active"].astype(str).str.strip()=="")
-            p.loc[m, "Active"] = "Yes"
+            p["Active"] = p["Active"].astype(object).where(~_blank(p["Active"]), "Yes")
         else:
             p["Active"] = "Yes"
     data["Personnel"] = p
 
-    a = ensure_columns(data.get("Apparatus", pd.DataFrame()), APPARATUS_SCHEMA).copy()
+    a = ensure_columns(data.get("Apparatus", pd.DataFrame()), APPARATUS_SCHEMA)
     if not a.empty:
         if "Active" in a.columns:
-            m = a["Active"].isna() | (a["Active"].astype(str).str.strip()=="")
-            a.loc[m, "Active"] = "Yes"
+            a["Active"] = a["Active"].astype(object).where(~_blank(a["Active"]), "Yes")
         else:
             a["Active"] = "Yes"
     data["Apparatus"] = a
     return data
 
+_TRUTHY = frozenset({"1","true","yes","y"})
+
 def _coerce_bool(x):
-    s = str(x).strip().lower()
-    return s in ("1","true","yes","y")
+    return str(x).strip().lower() in _TRUTHY
+
+def _truthy(s: pd.Series) -> pd.Series:
+    # _coerce_bool over a whole column: evaluated once per distinct value (Active/permission flags have a handful), then gathered by code
+    codes, uniques = pd.factorize(s)
+    lut = np.array([_coerce_bool(u) for u in uniques] + [False], dtype=bool)
+    return pd.Series(lut[codes], index=s.index)
 
 def apply_role_presets(df: pd.DataFrame) -> pd.DataFrame:
-    df = ensure_columns(df, USERS_SCHEMA).copy()
-    for i, row in df.iterrows():
-        role = str(row.get("Role","")).strip() or "Member"
-        preset = ROLE_PRESETS.get(role, ROLE_PRESETS["Member"])
-        for k, v in preset.items():
-            if pd.isna(row.get(k)) or str(row.get(k)).strip()=="":
-                df.at[i, k] = v
+    df = ensure_columns(df, USERS_SCHEMA)  # the caller replaces data["Users"] with the result, so no defensive copy
+    # each user's preset row (blank/unknown roles fall back to Member), gathered once; blank permission cells take from it
+    roles = df["Role"].astype("string").str.strip()
+    presets = pd.DataFrame.from_dict(ROLE_PRESETS, orient="index").reindex(roles.where(roles.isin(list(ROLE_PRESETS)), "Member").to_numpy())
+    for k in presets.columns:
+        blank = _blank(df[k])
+        if blank.any():
+            df[k] = df[k].astype(object).where(~blank, presets[k].to_numpy())
     if "Active" in df.columns:
-        mask = df["Active"].isna() | (df["Active"].astype(str).str.strip()=="")
-        df.loc[mask, "Active"] = "Yes"
+        df.loc[_blank(df["Active"]), "Active"] = "Yes"
+    return df
+
+# passwords are stored as keyed BLAKE2b digests; set APP_SECRET (up to 64 bytes) per deployment and keep it stable,
+# changing it invalidates every stored hash. Rows that still only have a plaintext Password keep working until re-saved.
+_PW_KEY = os.environ.get("APP_SECRET", "").encode()[:64]
+
+def hash_password(pwd: str) -> str:
+    return hashlib.blake2b(pwd.encode(), key=_PW_KEY, digest_size=16).hexdigest()
+
+def password_ok(user_row: dict, pwd: str) -> bool:
+    stored = _txt(user_row.get("PasswordHash"))
+    if stored:
+        return hmac.compare_digest(stored, hash_password(pwd))
+    plain = _txt(user_row.get("Password"))
+    return bool(plain) and hmac.compare_digest(plain.encode(), pwd.encode())
+
+def seal_passwords(df: pd.DataFrame) -> pd.DataFrame:
+    # any Password typed into the Users grid is replaced by its hash before the sheet is written
+    typed = ~_blank(df["Password"])
+    if typed.any():
+        hashes = pd.Series([hash_password(_txt(v)) for v in df.loc[typed, "Password"]], index=df.index[typed])
+        df["PasswordHash"] = df["PasswordHash"].astype(object).where(~typed, hashes)
+        df["Password"] = df["Password"].astype(object).where(~typed, None)
     return df
 
 def can(user_row: dict, perm: str) -> bool:
@@ -199,29 +769,45 @@ def can(user_row: dict, perm: str) -> bool:
 st.sidebar.title("📝 Fire Incident Reports — v4.3.2")
 file_path = st.sidebar.text_input("Excel path", value=DEFAULT_FILE, key="path_input_auth")
 uploaded = st.sidebar.file_uploader("Upload/replace workbook (.xlsx)", type=["xlsx"], key="upload_auth")
-if uploaded:
-    with open(file_path, "wb") as f: f.write(uploaded.read())
+# the uploader keeps returning the same file on every rerun; only a new payload (or target path) replaces the workbook
+upload_digest = (file_path, hashlib.blake2b(uploaded.getvalue(), digest_size=16).hexdigest()) if uploaded else None
+if uploaded and upload_digest != st.session_state.get("_upload_digest"):
+    saver = get_saver()
+    saver.cancel(file_path, session_id())
+    saver.write(write_bytes, file_path, uploaded.getvalue())
+    st.session_state["_upload_digest"] = upload_digest
+    mark_clean()  # the uploaded workbook replaces any unsaved edits
     st.sidebar.success(f"Saved to {file_path}")
 st.session_state.setdefault("autosave", True)
 st.session_state["autosave"] = st.sidebar.toggle("Autosave to Excel", value=True, key="autosave_auth")
 st.sidebar.caption(f"File exists: {'✅' if os.path.exists(file_path) else '❌'}")
 
 data: Dict[str, pd.DataFrame] = {}
+# unsaved edits live in session state between reruns; anything else comes from the (cached) workbook
+pending = st.session_state.get("_pending")
+if pending and st.session_state.get("_dirty") and pending[0] != file_path:
+    ok, err = save_now(pending[1], pending[0])  # don't strand unsaved edits when the path changes
+    if not ok:
+        # keep the edits (and their dirty state) for the old file rather than loading over them
+        st.sidebar.error(f"Unsaved changes to {pending[0]} could not be saved: {err}. Switch back to that path to keep working on them.")
+        st.stop()
 if os.path.exists(file_path):
-    data = load_workbook(file_path)
+    from_pending = bool(pending and st.session_state.get("_dirty") and pending[0] == file_path)
+    if from_pending:
+        data = pending[1]
+    else:
+        if st.session_state.get("_from_pending"):
+            bump_version()  # back on the file's frames: memos built from the session's copy don't apply
+        stamp = file_stamp(file_path)
+        data = load_normalized(file_path, stamp)
+        # what the next edits start from; saves merge against it if the file moves on underneath this session
+        st.session_state["_base"] = (file_path, stamp, {k: v.copy(deep=False) for k, v in data.items()})
+    st.session_state["_pending"] = (file_path, data)
+    st.session_state["_from_pending"] = from_pending
 else:
     st.info("Upload or point to your Excel workbook to begin.")
     st.stop()
 
-ensure_table(data, "Incidents", [
-    PRIMARY_KEY,"IncidentDate","IncidentTime","IncidentType","ResponsePriority","AlarmLevel","Shift",
-    "LocationName","Address","City","State","PostalCode","Latitude","Longitude",
-    "Narrative","Status","CreatedBy","SubmittedAt","ReviewedBy","ReviewedAt","ReviewerComments"
-])
-ensure_table(data, "Personnel", PERSONNEL_SCHEMA)
-ensure_table(data, "Apparatus", APPARATUS_SCHEMA)
-for t, cols in CHILD_TABLES.items(): ensure_table(data, t, cols)
-
 users = ensure_columns(data.get("Users", pd.DataFrame()), USERS_SCHEMA)
 if users.empty or "Username" not in users.columns or users["Username"].isna().all():
     users = pd.DataFrame([
@@ -238,10 +824,11 @@ def sign_in_ui(users_df: pd.DataFrame):
     p = st.text_input("Password", type="password", key="login_pass_auth")
     ok = st.button("Sign In", key="btn_login_auth")
     if ok:
-        row = users_df[(users_df["Username"].astype(str)==u) & (users_df["Password"].astype(str)==p) & (users_df["Active"].astype(str).str.lower().isin(["yes","true","1"]))]
-        if not row.empty:
-            st.session_state["user"] = row.iloc[0].to_dict()
-            st.success(f"Welcome, {row.iloc[0].get('FullName', u)}!"); st.rerun()
+        cands = users_df[users_df["Username"].astype(str).eq(u) & _truthy(users_df["Active"])]
+        row = next((r for r in cands.to_dict("records") if password_ok(r, p)), None)
+        if row:
+            st.session_state["user"] = row
+            st.success(f"Welcome, {row.get('FullName', u)}!"); st.rerun()
         else:
             st.error("Invalid credentials or inactive user.")
 
@@ -249,8 +836,11 @@ def sign_out_button():
     if st.button("Sign Out", key="btn_logout_auth"):
         st.session_state.pop("user", None); st.rerun()
 
-data = repair_rosters(data)
-lookups = get_lookups(data)
+# per-session memo on the workbook key first, so a rerun doesn't even hash the lookup sheets for cache_data
+lookups = session_memo("_lookups", workbook_state_key(file_path), lambda: get_lookups({s: data[s] for s in LOOKUP_SHEETS if s in data}))
+lookup_opts = session_memo("_lookup_opts", workbook_state_key(file_path), lambda: {k: ("",) + tuple(v) for k, v in lookups.items()})
+# value -> option index per lookup (first occurrence wins, like list.index)
+lookup_pos = session_memo("_lookup_pos", workbook_state_key(file_path), lambda: {k: {v: i for i, v in reversed(list(enumerate(o)))} for k, o in lookup_opts.items()})
 
 if "user" not in st.session_state:
     sign_in_ui(data["Users"]); st.stop()
@@ -258,11 +848,17 @@ user = st.session_state["user"]
 st.sidebar.write(f"**Logged in as:** {user.get('FullName', user.get('Username',''))}  \\nRole: {user.get('Role','')}")
 sign_out_button()
 
-tabs = st.tabs(["Write Report","Review Queue","Rejected","Approved","Rosters","Print","Export","Admin","Diagnostics"])
+# key/status views only change with the workbook, so reruns that just move widgets reuse them
+inc_pos, by_status = session_memo("_incident_views", workbook_state_key(file_path), lambda: incident_views(data["Incidents"]))
+no_incidents = data["Incidents"].iloc[0:0]
+
+# sections instead of st.tabs: st.tabs runs every tab body on each rerun, a radio runs only the one on screen
+SECTIONS = ["Write Report","Review Queue","Rejected","Approved","Rosters","Print","Export","Admin","Diagnostics"]
+section = st.radio("Section", SECTIONS, horizontal=True, key="active_tab", label_visibility="collapsed")
 
-with tabs[0]:
+if section == "Write Report":
     st.header("Write Report")
-    master = data["Incidents"].copy()
+    master = data["Incidents"]  # read-only here; saves go through upsert_row
     preselect = st.session_state.get("edit_incident_preselect")
     force_edit = st.session_state.get("force_edit_mode", False)
     if preselect:
@@ -275,50 +871,97 @@ with tabs[0]:
         if can(user,"CanEditAll"):
             options_df = master
         elif can(user,"CanEditOwn"):
-            options_df = master[master["CreatedBy"].astype(str) == user.get("Username")]
+            options_df = master[key_mask(master, user.get("Username"), "CreatedBy")]
         else:
-            options_df = master.iloc(0,0)
-        options = options_df[PRIMARY_KEY].dropna().astype(str).tolist() if PRIMARY_KEY in options_df.columns else []
+            options_df = master.iloc[0:0]
+        # the key column is already STRING_DTYPE (load_normalized / append_rows keep it so); no astype(str) copy
+        options = options_df[PRIMARY_KEY].dropna().tolist() if PRIMARY_KEY in options_df.columns else []
         kwargs = {"options": options, "placeholder": "Choose...", "key": "pick_edit_write_auth"}
         if preselect and preselect in options:
             kwargs["index"] = options.index(preselect)
         selected = st.selectbox("Select IncidentNumber", **kwargs)
         if selected:
-            defaults = master[master[PRIMARY_KEY].astype(str) == selected].iloc[0].to_dict()
+            defaults = record_for_key(master, inc_pos, selected)
             st.session_state["edit_incident_preselect"] = None
             st.session_state["force_edit_mode"] = False
+    defaults_str = {k: _txt(v) for k, v in defaults.items()}  # widget values: blanks/NaN/NaT -> ""
 
-    with st.container(border=True):
+    # IncidentNumber stays live (members/apparatus/times below key off it); the rest of the report is a form,
+    # so typing in it doesn't rerun the whole app until Save Draft / Submit
+    inc_num = st.columns(3)[0].text_input("IncidentNumber", value=defaults_str.get(PRIMARY_KEY, ""), key="w_inc_num_auth")
+    report_form = st.form("w_report_form", border=False)
+    with report_form.container(border=True):
         st.subheader("Incident Details")
-        c1, c2, c3 = st.columns(3)
-        inc_num = c1.text_input("IncidentNumber", value=str(defaults.get(PRIMARY_KEY,"")) if defaults else "", key="w_inc_num_auth")
-        inc_date = c2.date_input("IncidentDate", value=pd.to_datetime(defaults.get("IncidentDate")).date() if defaults.get("IncidentDate") is not None and str(defaults.get("IncidentDate")) != "NaT" else date.today(), key="w_inc_date_auth")
-        inc_time = c3.text_input("IncidentTime (HH:MM)", value=str(defaults.get("IncidentTime","")) if defaults else "", key="w_inc_time_auth")
+        c2, c3 = st.columns(2)
+        inc_date = c2.date_input("IncidentDate", value=_as_date(defaults.get("IncidentDate")), key="w_inc_date_auth")
+        inc_time = c3.text_input("IncidentTime (HH:MM)", value=defaults_str.get("IncidentTime", ""), key="w_inc_time_auth")
         c4, c5, c6 = st.columns(3)
-        inc_type = c4.selectbox("IncidentType", options=[""]+lookups.get("IncidentType", []), index=([""]+lookups.get("IncidentType", [])).index(str(defaults.get("IncidentType",""))) if defaults.get("IncidentType") in lookups.get("IncidentType", []) else 0, key="w_type_auth")
-        inc_prio = c5.selectbox("ResponsePriority", options=[""]+lookups.get("ResponsePriority", []), index=([""]+lookups.get("ResponsePriority", [])).index(str(defaults.get("ResponsePriority",""))) if defaults.get("ResponsePriority") in lookups.get("ResponsePriority", []) else 0, key="w_prio_auth")
-        inc_alarm = c6.selectbox("AlarmLevel", options=[""]+lookups.get("AlarmLevel", []), index=([""]+lookups.get("AlarmLevel", [])).index(str(defaults.get("AlarmLevel",""))) if defaults.get("AlarmLevel") in lookups.get("AlarmLevel", []) else 0, key="w_alarm_auth")
+        inc_type = c4.selectbox("IncidentType", options=lookup_opts.get("IncidentType", ("",)), index=lookup_pos.get("IncidentType", {}).get(defaults_str.get("IncidentType"), 0), key="w_type_auth")
+        inc_prio = c5.selectbox("ResponsePriority", options=lookup_opts.get("ResponsePriority", ("",)), index=lookup_pos.get("ResponsePriority", {}).get(defaults_str.get("ResponsePriority"), 0), key="w_prio_auth")
+        inc_alarm = c6.selectbox("AlarmLevel", options=lookup_opts.get("AlarmLevel", ("",)), index=lookup_pos.get("AlarmLevel", {}).get(defaults_str.get("AlarmLevel"), 0), key="w_alarm_auth")
         c7, c8, c9 = st.columns(3)
-        loc_name = c7.text_input("LocationName", value=str(defaults.get("LocationName","")) if defaults else "", key="w_locname_auth")
-        addr = c8.text_input("Address", value=str(defaults.get("Address","")) if defaults else "", key="w_addr_auth")
-        city = c9.text_input("City", value=str(defaults.get("City","")) if defaults else "", key="w_city_auth")
+        loc_name = c7.text_input("LocationName", value=defaults_str.get("LocationName", ""), key="w_locname_auth")
+        addr = c8.text_input("Address", value=defaults_str.get("Address", ""), key="w_addr_auth")
+        city = c9.text_input("City", value=defaults_str.get("City", ""), key="w_city_auth")
         c10, c11, c12 = st.columns(3)
-        state = c10.text_input("State", value=str(defaults.get("State","")) if defaults else "", key="w_state_auth")
-        postal = c11.text_input("PostalCode", value=str(defaults.get("PostalCode","")) if defaults else "", key="w_postal_auth")
-        shift = c12.text_input("Shift", value=str(defaults.get("Shift","")) if defaults else "", key="w_shift_auth")
+        state = c10.text_input("State", value=defaults_str.get("State", ""), key="w_state_auth")
+        postal = c11.text_input("PostalCode", value=defaults_str.get("PostalCode", ""), key="w_postal_auth")
+        shift = c12.text_input("Shift", value=defaults_str.get("Shift", ""), key="w_shift_auth")
 
-    with st.container(border=True):
+    with report_form.container(border=True):
         st.subheader("Narrative")
-        narrative = st.text_area("Write full narrative here", value=str(defaults.get("Narrative","")) if defaults else "", height=320, key="w_narrative_auth")
+        narrative = st.text_area("Write full narrative here", value=defaults_str.get("Narrative", ""), height=320, key="w_narrative_auth")
+    a = report_form.columns(3)
+    save_draft = a[0].form_submit_button("Save Draft", key="w_save_draft_btn")
+    submit_review = a[1].form_submit_button("Submit for Review", key="w_submit_review_btn")
+    row_vals = {
+        PRIMARY_KEY: (str(inc_num).strip() if inc_num else ""),
+        "IncidentDate": pd.to_datetime(inc_date),
+        "IncidentTime": inc_time,
+        "IncidentType": inc_type,
+        "ResponsePriority": inc_prio,
+        "AlarmLevel": inc_alarm,
+        "LocationName": loc_name,
+        "Address": addr,
+        "City": city,
+        "State": state,
+        "PostalCode": postal,
+        "Shift": shift,
+        "Narrative": narrative,
+        "CreatedBy": user.get("Username",""),
+    }
+    if save_draft:
+        if not can(user,"CanWrite"):
+            st.error("You do not have permission to write.")
+        elif not row_vals[PRIMARY_KEY]:
+            st.error("Enter **IncidentNumber** before saving.")
+        else:
+            row_vals["Status"] = "Draft"
+            data["Incidents"] = upsert_row(data["Incidents"], row_vals, key=PRIMARY_KEY, groups=inc_pos)
+            inc_pos, by_status = incident_views(data["Incidents"])
+            mark_dirty("Incidents")
+            st.success("Draft saved.")
+    if submit_review:
+        if not can(user,"CanWrite"):
+            st.error("You do not have permission to submit.")
+        elif not row_vals[PRIMARY_KEY]:
+            st.error("Enter **IncidentNumber** before submitting.")
+        else:
+            row_vals["Status"] = "Submitted"; row_vals["SubmittedAt"] = datetime.now().strftime("%Y-%m-%d %H:%M")
+            data["Incidents"] = upsert_row(data["Incidents"], row_vals, key=PRIMARY_KEY, groups=inc_pos)
+            inc_pos, by_status = incident_views(data["Incidents"])
+            mark_dirty("Incidents")
+            st.success("Submitted for review.")
 
     with st.container(border=True):
         st.subheader("All Members on Scene")
-        people_df = ensure_columns(data.get("Personnel", pd.DataFrame()), PERSONNEL_SCHEMA)
+        people_df = data["Personnel"]
         if "Rank" in people_df.columns:
-            people_df["Rank"] = people_df["Rank"].astype(str)
-        person_opts = build_person_options(people_df)
-        app_df_all = ensure_columns(data.get("Apparatus", pd.DataFrame()), APPARATUS_SCHEMA)
-        unit_opts_all = build_unit_options(app_df_all)
+            people_df["Rank"] = people_df["Rank"].astype(STRING_DTYPE)
+        # roster edits are saved straight to disk, so the workbook key covers them; skips even the cache_data hash
+        person_opts = session_memo("_person_opts", workbook_state_key(file_path), lambda: build_person_options(people_df))
+        app_df_all = data["Apparatus"]
+        unit_opts_all = session_memo("_unit_opts", workbook_state_key(file_path), lambda: build_unit_options(app_df_all))
         picked_people = st.multiselect("Pick members", options=person_opts, key="w_pick_people_auth")
         roles = lookups.get("Role", ["OIC","Driver","Firefighter"])
         cc = st.columns(4)
@@ -330,44 +973,42 @@ with tabs[0]:
                 st.error("Enter **IncidentNumber** before adding members.")
             else:
                 inc_key = str(inc_num).strip()
-                df = ensure_columns(data.get("Incident_Personnel", pd.DataFrame()), CHILD_TABLES["Incident_Personnel"])
-                new = []
-                people_df = data.get('Personnel', pd.DataFrame())
-                for n in picked_people:
-                    pid = _lookup_personnel_id(people_df, n)
-                    new.append({
-                        PRIMARY_KEY: inc_key,
-                        'PersonnelID': pid,
-                        'Name': n,
-                        'Role': role_default,
-                        'Hours': hours_default,
-                        'RespondedIn': (responded_in_default or None),
-                    })
-                if new:
-                    data["Incident_Personnel"] = pd.concat([df, pd.DataFrame(new)], ignore_index=True)
-                    if st.session_state.get("autosave", True): save_to_path(data, file_path)
+                df = data["Incident_Personnel"]
+                # whole selection as one column-built block -> a single concat
+                new = pd.DataFrame({
+                    PRIMARY_KEY: inc_key,
+                    'PersonnelID': _lookup_personnel_ids(data.get('Personnel', pd.DataFrame()), picked_people),
+                    'Name': picked_people,
+                    'Role': role_default,
+                    'Hours': hours_default,
+                    'RespondedIn': (responded_in_default or None),
+                }, index=range(len(picked_people)))
+                if not new.empty:
+                    data["Incident_Personnel"] = append_rows(df, new)
+                    mark_dirty("Incident_Personnel")
                     st.success(f"Added {len(new)} member(s) to incident {inc_key}.")
                 else:
                     st.warning("No members selected.")
-        cur_per = ensure_columns(data.get("Incident_Personnel", pd.DataFrame()), CHILD_TABLES["Incident_Personnel"])
-        this_per = cur_per[cur_per[PRIMARY_KEY].astype(str) == (str(inc_num).strip() if inc_num else "__none__")].copy()
+        cur_per = data["Incident_Personnel"]
+        # checked positions: "Save Personnel Grid" drops exactly these rows, so they must belong to this incident
+        per_pos = group_positions(cur_per, child_groups(data, file_path)["Incident_Personnel"], str(inc_num).strip() if inc_num else "__none__")
+        this_per = cur_per.iloc[per_pos]
         if not this_per.empty and "Delete" not in this_per.columns:
             this_per["Delete"] = False
         st.write(f"**Total Personnel on Scene:** {0 if this_per.empty else len(this_per)}")
         this_per_edit = st.data_editor(this_per, num_rows="dynamic", use_container_width=True, key="editor_incident_personnel")
         cdel = st.columns(2)
         if cdel[0].button("Save Personnel Grid", key="btn_save_incident_personnel"):
-            base = cur_per[cur_per[PRIMARY_KEY].astype(str) != (str(inc_num).strip() if inc_num else "__none__")]
+            base = cur_per.drop(index=cur_per.index[per_pos])
             if "Delete" in this_per_edit.columns:
                 this_per_edit = this_per_edit[this_per_edit["Delete"] != True].drop(columns=["Delete"], errors="ignore")
-            data["Incident_Personnel"] = pd.concat([base, this_per_edit], ignore_index=True)
-            if st.session_state.get("autosave", True): save_to_path(data, file_path)
+            data["Incident_Personnel"] = append_rows(base, this_per_edit)
+            mark_dirty("Incident_Personnel")
             st.success("Incident personnel updated (removals applied if any).")
 
     with st.container(border=True):
         st.subheader("Apparatus on Scene")
-        app_df = ensure_columns(data.get("Apparatus", pd.DataFrame()), APPARATUS_SCHEMA)
-        unit_opts = build_unit_options(app_df)
+        unit_opts = unit_opts_all
         picked_units = st.multiselect("Pick apparatus units", options=unit_opts, key="w_pick_units_auth")
         unit_type_options = list(dict.fromkeys(["Mini Pumper"] + lookups.get("UnitType", [])))
         cc2 = st.columns(4)
@@ -379,48 +1020,45 @@ with tabs[0]:
                 st.error("Enter **IncidentNumber** before adding apparatus.")
             else:
                 inc_key = str(inc_num).strip()
-                df = ensure_columns(data.get("Incident_Apparatus", pd.DataFrame()), CHILD_TABLES["Incident_Apparatus"])
-                new = []
-                app_df = data.get('Apparatus', pd.DataFrame())
-                for u in picked_units:
-                    aid = _lookup_apparatus_id(app_df, u)
-                    new.append({
-                        PRIMARY_KEY: inc_key,
-                        'ApparatusID': aid,
-                        'Unit': u,
-                        'UnitType': (unit_type if unit_type else None),
-                        'Role': unit_role,
-                        'Actions': unit_actions or '',
-                    })
-                if new:
-                    data["Incident_Apparatus"] = pd.concat([df, pd.DataFrame(new)], ignore_index=True)
-                    if st.session_state.get("autosave", True): save_to_path(data, file_path)
+                df = data["Incident_Apparatus"]
+                new = pd.DataFrame({
+                    PRIMARY_KEY: inc_key,
+                    'ApparatusID': _lookup_apparatus_ids(data.get('Apparatus', pd.DataFrame()), picked_units),
+                    'Unit': picked_units,
+                    'UnitType': (unit_type if unit_type else None),
+                    'Role': unit_role,
+                    'Actions': unit_actions or '',
+                }, index=range(len(picked_units)))
+                if not new.empty:
+                    data["Incident_Apparatus"] = append_rows(df, new)
+                    mark_dirty("Incident_Apparatus")
                     st.success(f"Added {len(new)} unit(s) to incident {inc_key}.")
                 else:
                     st.warning("No units selected.")
-        cur_app = ensure_columns(data.get("Incident_Apparatus", pd.DataFrame()), CHILD_TABLES["Incident_Apparatus"])
-        this_app = cur_app[cur_app[PRIMARY_KEY].astype(str) == (str(inc_num).strip() if inc_num else "__none__")].copy()
+        cur_app = data["Incident_Apparatus"]
+        app_pos = group_positions(cur_app, child_groups(data, file_path)["Incident_Apparatus"], str(inc_num).strip() if inc_num else "__none__")
+        this_app = cur_app.iloc[app_pos]
         if not this_app.empty and "Delete" not in this_app.columns:
             this_app["Delete"] = False
         st.write(f"**Total Apparatus on Scene:** {0 if this_app.empty else len(this_app)}")
         this_app_edit = st.data_editor(this_app, num_rows="dynamic", use_container_width=True, key="editor_incident_apparatus")
         cdel2 = st.columns(2)
         if cdel2[0].button("Save Apparatus Grid", key="btn_save_incident_apparatus"):
-            base = cur_app[cur_app[PRIMARY_KEY].astype(str) != (str(inc_num).strip() if inc_num else "__none__")]
+            base = cur_app.drop(index=cur_app.index[app_pos])
             if "Delete" in this_app_edit.columns:
                 this_app_edit = this_app_edit[this_app_edit["Delete"] != True].drop(columns=["Delete"], errors="ignore")
-            data["Incident_Apparatus"] = pd.concat([base, this_app_edit], ignore_index=True)
-            if st.session_state.get("autosave", True): save_to_path(data, file_path)
+            data["Incident_Apparatus"] = append_rows(base, this_app_edit)
+            mark_dirty("Incident_Apparatus")
             st.success("Incident apparatus updated (removals applied if any).")
 
-    with st.container(border=True):
+    with st.form("w_times_form"):
         st.subheader("Times (optional)")
         t1, t2, t3, t4 = st.columns(4)
         alarm = t1.text_input("Alarm (HH:MM)", key="w_alarm_time_auth")
         enroute = t2.text_input("Enroute (HH:MM)", key="w_enroute_time_auth")
         arrival = t3.text_input("Arrival (HH:MM)", key="w_arrival_time_auth")
         clear = t4.text_input("Clear (HH:MM)", key="w_clear_time_auth")
-        if st.button("Save Times", key="w_save_times_auth"):
+        if st.form_submit_button("Save Times", key="w_save_times_auth"):
             if not inc_num or str(inc_num).strip() == "":
                 st.error("Enter **IncidentNumber** before saving times.")
             else:
@@ -428,61 +1066,23 @@ with tabs[0]:
                 times = data["Incident_Times"]
                 new = {PRIMARY_KEY: inc_key, "Alarm": alarm, "Enroute": enroute, "Arrival": arrival, "Clear": clear}
                 data["Incident_Times"] = upsert_row(times, new, key=PRIMARY_KEY)
-                if st.session_state.get("autosave", True): save_to_path(data, file_path)
+                mark_dirty("Incident_Times")
                 st.success("Times saved.")
 
-    row_vals = {
-        PRIMARY_KEY: (str(inc_num).strip() if inc_num else ""),
-        "IncidentDate": pd.to_datetime(inc_date),
-        "IncidentTime": inc_time,
-        "IncidentType": inc_type,
-        "ResponsePriority": inc_prio,
-        "AlarmLevel": inc_alarm,
-        "LocationName": loc_name,
-        "Address": addr,
-        "City": city,
-        "State": state,
-        "PostalCode": postal,
-        "Shift": shift,
-        "Narrative": narrative,
-        "CreatedBy": user.get("Username",""),
-    }
-    a = st.columns(3)
-    if a[0].button("Save Draft", key="w_save_draft_btn"):
-        if not can(user,"CanWrite"):
-            st.error("You do not have permission to write.")
-        elif not row_vals[PRIMARY_KEY]:
-            st.error("Enter **IncidentNumber** before saving.")
-        else:
-            row_vals["Status"] = "Draft"
-            data["Incidents"] = upsert_row(data["Incidents"], row_vals, key=PRIMARY_KEY)
-            if st.session_state.get("autosave", True): save_to_path(data, file_path)
-            st.success("Draft saved.")
-    if a[1].button("Submit for Review", key="w_submit_review_btn"):
-        if not can(user,"CanWrite"):
-            st.error("You do not have permission to submit.")
-        elif not row_vals[PRIMARY_KEY]:
-            st.error("Enter **IncidentNumber** before submitting.")
-        else:
-            row_vals["Status"] = "Submitted"; row_vals["SubmittedAt"] = datetime.now().strftime("%Y-%m-%d %H:%M")
-            data["Incidents"] = upsert_row(data["Incidents"], row_vals, key=PRIMARY_KEY)
-            if st.session_state.get("autosave", True): save_to_path(data, file_path)
-            st.success("Submitted for review.")
-
-with tabs[1]:
+if section == "Review Queue":
     st.header("Review Queue")
-    pending = data["Incidents"][data["Incidents"]["Status"].astype(str) == "Submitted"]
-    st.dataframe(pending, use_container_width=True, hide_index=True, key="grid_pending_auth")
+    pending = by_status.get("Submitted", no_incidents)
+    st.dataframe(arrow_grid(pending, file_path, "pending"), use_container_width=True, hide_index=True, key="grid_pending_auth")
     sel = None
     if not pending.empty:
-        sel = st.selectbox("Pick an Incident to review", options=pending[PRIMARY_KEY].astype(str).tolist(), index=None, placeholder="Choose...", key="pick_review_queue_auth")
+        sel = st.selectbox("Pick an Incident to review", options=pending[PRIMARY_KEY].dropna().tolist(), index=None, placeholder="Choose...", key="pick_review_queue_auth")
     if sel:
-        rec = data["Incidents"][data["Incidents"][PRIMARY_KEY].astype(str) == sel].iloc[0].to_dict()
+        rec = record_for_key(data["Incidents"], inc_pos, sel)
         st.subheader(f"Incident {sel}")
         st.write(f"**Type:** {rec.get('IncidentType','')}  |  **Priority:** {rec.get('ResponsePriority','')}  |  **Alarm:** {rec.get('AlarmLevel','')}")
         st.write(f"**Location:** {rec.get('Address','')} {rec.get('City','')} {rec.get('State','')} {rec.get('PostalCode','')}")
         st.write("**Narrative:**")
-        st.text_area("Narrative (read-only)", value=str(rec.get("Narrative","")), height=240, key="narrative_readonly_review", disabled=True)
+        readonly_text("Narrative (read-only)", rec.get("Narrative"), 240)
         comments = st.text_area("Reviewer Comments", key="rev_comments_queue_auth")
         c = st.columns(3)
         if can(user,"CanReview"):
@@ -490,67 +1090,72 @@ with tabs[1]:
                 if not can(user,"CanApprove"):
                     st.error("No permission to approve.")
                 else:
-                    row = rec; row["Status"] = "Approved"; row["ReviewedBy"] = user.get("Username"); row["ReviewedAt"] = datetime.now().strftime("%Y-%m-%d %H:%M"); row["ReviewerComments"] = comments
-                    data["Incidents"] = upsert_row(data["Incidents"], row, key=PRIMARY_KEY)
-                    if st.session_state.get("autosave", True): save_to_path(data, file_path)
+                    data["Incidents"] = patch_incident(data["Incidents"], inc_pos, sel, Status="Approved", ReviewedBy=user.get("Username"),
+                                                       ReviewedAt=datetime.now().strftime("%Y-%m-%d %H:%M"), ReviewerComments=comments)
+                    inc_pos, by_status = incident_views(data["Incidents"])
+                    mark_dirty("Incidents")
                     st.success("Approved.")
             if c[1].button("Reject", key="btn_reject_queue_auth"):
-                row = rec; row["Status"] = "Rejected"; row["ReviewedBy"] = user.get("Username"); row["ReviewedAt"] = datetime.now().strftime("%Y-%m-%d %H:%M"); row["ReviewerComments"] = comments or "Please revise."
-                data["Incidents"] = upsert_row(data["Incidents"], row, key=PRIMARY_KEY)
-                if st.session_state.get("autosave", True): save_to_path(data, file_path)
+                data["Incidents"] = patch_incident(data["Incidents"], inc_pos, sel, Status="Rejected", ReviewedBy=user.get("Username"),
+                                                   ReviewedAt=datetime.now().strftime("%Y-%m-%d %H:%M"), ReviewerComments=comments or "Please revise.")
+                inc_pos, by_status = incident_views(data["Incidents"])
+                mark_dirty("Incidents")
                 st.warning("Rejected.")
             if c[2].button("Send back to Draft", key="btn_backtodraft_queue_auth"):
-                row = rec; row["Status"] = "Draft"; row["ReviewerComments"] = comments
-                data["Incidents"] = upsert_row(data["Incidents"], row, key=PRIMARY_KEY)
-                if st.session_state.get("autosave", True): save_to_path(data, file_path)
+                data["Incidents"] = patch_incident(data["Incidents"], inc_pos, sel, Status="Draft", ReviewerComments=comments)
+                inc_pos, by_status = incident_views(data["Incidents"])
+                mark_dirty("Incidents")
                 st.info("Moved back to Draft.")
 
-with tabs[2]:
+if section == "Rejected":
     st.header("Rejected Reports")
     if can(user,"CanEditAll"):
-        rejected = data["Incidents"][data["Incidents"]["Status"].astype(str) == "Rejected"]
+        rejected = by_status.get("Rejected", no_incidents)
     else:
-        rejected = data["Incidents"][(data["Incidents"]["Status"].astype(str) == "Rejected") & (data["Incidents"]["CreatedBy"].astype(str) == user.get("Username"))]
-    st.dataframe(rejected, use_container_width=True, hide_index=True, key="grid_rejected_auth")
+        rejected = by_status.get("Rejected", no_incidents)
+        rejected = rejected[key_mask(rejected, user.get("Username"), "CreatedBy")]
+    st.dataframe(arrow_grid(rejected, file_path, f"rejected:{user.get('Username')}"), use_container_width=True, hide_index=True, key="grid_rejected_auth")
     selr = None
     if not rejected.empty:
-        selr = st.selectbox("Pick a Rejected Incident", options=rejected[PRIMARY_KEY].astype(str).tolist(), index=None, placeholder="Choose...", key="pick_rejected_auth")
+        selr = st.selectbox("Pick a Rejected Incident", options=rejected[PRIMARY_KEY].dropna().tolist(), index=None, placeholder="Choose...", key="pick_rejected_auth")
     if selr:
-        rec = data["Incidents"][data["Incidents"][PRIMARY_KEY].astype(str) == selr].iloc[0].to_dict()
+        rec = record_for_key(data["Incidents"], inc_pos, selr)
         st.subheader(f"Incident {selr} — Reviewer Comments")
-        st.text_area("Reviewer Comments (read-only)", value=str(rec.get("ReviewerComments","")), height=140, key="rejected_comments_readonly", disabled=True)
-        st.write("**Narrative (read-only):**")
-        st.text_area("Narrative", value=str(rec.get("Narrative","")), height=240, key="rejected_narrative_readonly", disabled=True)
+        readonly_text("Reviewer Comments (read-only)", rec.get("ReviewerComments"), 140)
+        readonly_text("Narrative (read-only)", rec.get("Narrative"), 240)
         c = st.columns(2)
         if c[0].button("Move back to Draft to Edit", key="btn_rejected_to_draft"):
-            rec["Status"] = "Draft"
-            data["Incidents"] = upsert_row(data["Incidents"], rec, key=PRIMARY_KEY)
-            if st.session_state.get("autosave", True): save_to_path(data, file_path)
+            data["Incidents"] = patch_incident(data["Incidents"], inc_pos, selr, Status="Draft")
+            inc_pos, by_status = incident_views(data["Incidents"])
+            mark_dirty("Incidents")
             st.session_state["edit_incident_preselect"] = str(selr)
             st.session_state["force_edit_mode"] = True
             st.success("Moved to Draft. Go to Write Report → Edit to revise and resubmit.")
 
-with tabs[3]:
+# child tables are only mutated in Write Report, so group them once here for the read-only sections
+if section in ("Approved", "Print"):
+    groups = child_groups(data, file_path)
+    ip_groups, ia_groups, times_groups = groups["Incident_Personnel"], groups["Incident_Apparatus"], groups["Incident_Times"]
+
+if section == "Approved":
     st.header("Approved Reports")
-    approved = data["Incidents"][data["Incidents"]["Status"].astype(str) == "Approved"]
-    st.dataframe(approved, use_container_width=True, hide_index=True, key="grid_approved_auth")
+    approved = by_status.get("Approved", no_incidents)
+    st.dataframe(arrow_grid(grid_preview(approved, "showall_approved_auth"), file_path, "approved"), use_container_width=True, hide_index=True, key="grid_approved_auth")
     sela = None
     if not approved.empty:
-        sela = st.selectbox("Pick an Approved Incident", options=approved[PRIMARY_KEY].astype(str).tolist(), index=None, placeholder="Choose...", key="pick_approved_auth")
+        sela = st.selectbox("Pick an Approved Incident", options=approved[PRIMARY_KEY].dropna().tolist(), index=None, placeholder="Choose...", key="pick_approved_auth")
     if sela:
-        rec = data["Incidents"][data["Incidents"][PRIMARY_KEY].astype(str) == sela].iloc[0].to_dict()
+        rec = record_for_key(data["Incidents"], inc_pos, sela)
         st.subheader(f"Incident {sela}")
         st.write(f"**Type:** {rec.get('IncidentType','')}  |  **Priority:** {rec.get('ResponsePriority','')}  |  **Alarm:** {rec.get('AlarmLevel','')}")
         st.write(f"**Date/Time:** {rec.get('IncidentDate','')} {rec.get('IncidentTime','')}")
         st.write(f"**Location:** {rec.get('LocationName','')} — {rec.get('Address','')} {rec.get('City','')} {rec.get('State','')} {rec.get('PostalCode','')}")
         st.write(f"**Shift:** {rec.get('Shift','')}  |  **Reviewed By:** {rec.get('ReviewedBy','')} at {rec.get('ReviewedAt','')}")
         st.write("**Narrative:**")
-        st.text_area("Narrative (read-only)", value=str(rec.get("Narrative","")), height=260, key="narrative_readonly_approved", disabled=True)
+        readonly_text("Narrative (read-only)", rec.get("Narrative"), 260)
 
-        ip = ensure_columns(data.get("Incident_Personnel", pd.DataFrame()), CHILD_TABLES["Incident_Personnel"])
-        ia = ensure_columns(data.get("Incident_Apparatus", pd.DataFrame()), CHILD_TABLES["Incident_Apparatus"])
-        ip_view = ip[ip[PRIMARY_KEY].astype(str) == str(sela)]
-        ia_view = ia[ia[PRIMARY_KEY].astype(str) == str(sela)]
+        ip_view = rows_in_group(data["Incident_Personnel"], ip_groups, sela)
+        ia_view = rows_in_group(data["Incident_Apparatus"], ia_groups, sela)
         st.markdown(f"**Personnel on Scene ({len(ip_view)}):**")
         if not ip_view.empty:
             show_person_cols = [c for c in ["Name","Role","Hours","RespondedIn"] if c in ip_view.columns]
@@ -564,46 +1169,49 @@ with tabs[3]:
         else:
             st.write("_None recorded._")
 
-with tabs[4]:
+# editing a roster grid reruns only this panel; the rest of the app picks the saved rosters up on its next run
+@st.fragment
+def rosters_panel(data: Dict[str, pd.DataFrame], file_path: str):
     st.header("Rosters")
     st.caption("Edit, then click Save. Rank is free text (letters allowed).")
     # Roster editing still permission-gated in earlier build; keep simple here:
-    personnel = ensure_columns(data.get("Personnel", pd.DataFrame()), PERSONNEL_SCHEMA)
+    personnel = data["Personnel"]
     if "Rank" in personnel.columns:
-        personnel["Rank"] = personnel["Rank"].astype(str)
+        personnel["Rank"] = personnel["Rank"].astype(STRING_DTYPE)
     personnel_edit = st.data_editor(personnel, num_rows="dynamic", use_container_width=True, key="editor_personnel_auth")
-    apparatus = ensure_columns(data.get("Apparatus", pd.DataFrame()), APPARATUS_SCHEMA)
+    apparatus = data["Apparatus"]
     apparatus_edit = st.data_editor(apparatus, num_rows="dynamic", use_container_width=True, key="editor_apparatus_auth")
     c = st.columns(3)
     if c[0].button("Save Personnel to Excel", key="save_personnel_auth"):
         data["Personnel"] = ensure_columns(personnel_edit, PERSONNEL_SCHEMA)
-        ok, err = save_to_path(data, file_path)
+        ok, err = save_now(data, file_path, "Personnel")
         st.success("Saved.") if ok else st.error(err)
     if c[1].button("Save Apparatus to Excel", key="save_apparatus_auth"):
         data["Apparatus"] = ensure_columns(apparatus_edit, APPARATUS_SCHEMA)
-        ok, err = save_to_path(data, file_path)
+        ok, err = save_now(data, file_path, "Apparatus")
         st.success("Saved.") if ok else st.error(err)
 
-with tabs[5]:
+if section == "Rosters":
+    rosters_panel(data, file_path)
+
+if section == "Print":
     st.header("Print")
     status = st.selectbox("Filter by Status", options=["","Approved","Submitted","Draft","Rejected"], key="print_status_auth")
-    base = data["Incidents"].copy()
-    if status: base = base[base["Status"].astype(str) == status]
-    st.dataframe(base, use_container_width=True, hide_index=True, key="grid_print_auth")
+    base = data["Incidents"]
+    if status: base = by_status.get(status, no_incidents)
+    st.dataframe(arrow_grid(grid_preview(base, "showall_print_auth"), file_path, f"print:{status}"), use_container_width=True, hide_index=True, key="grid_print_auth")
     sel = None
     if not base.empty:
-        sel = st.selectbox("Pick an Incident", options=base[PRIMARY_KEY].astype(str).tolist(), index=None, key="print_pick_auth")
+        sel = st.selectbox("Pick an Incident", options=base[PRIMARY_KEY].dropna().tolist(), index=None, key="print_pick_auth")
     if sel:
-        rec = data["Incidents"][data["Incidents"][PRIMARY_KEY].astype(str) == sel].iloc[0].to_dict()
+        rec = record_for_key(data["Incidents"], inc_pos, sel)
         st.subheader(f"Incident {sel}")
         st.write(f"**Type:** {rec.get('IncidentType','')}  |  **Priority:** {rec.get('ResponsePriority','')}  |  **Alarm:** {rec.get('AlarmLevel','')}")
         st.write(f"**Location:** {rec.get('Address','')} {rec.get('City','')} {rec.get('State','')} {rec.get('PostalCode','')}")
         st.write("**Narrative:**")
-        st.text_area("Narrative (read-only)", value=str(rec.get("Narrative","")), height=220, key="narrative_readonly_print", disabled=True)
-        ip = ensure_columns(data.get("Incident_Personnel", pd.DataFrame()), CHILD_TABLES["Incident_Personnel"])
-        ia = ensure_columns(data.get("Incident_Apparatus", pd.DataFrame()), CHILD_TABLES["Incident_Apparatus"])
-        ip_view = ip[ip[PRIMARY_KEY].astype(str) == str(sel)]
-        ia_view = ia[ia[PRIMARY_KEY].astype(str) == str(sel)]
+        readonly_text("Narrative (read-only)", rec.get("Narrative"), 220)
+        ip_view = rows_in_group(data["Incident_Personnel"], ip_groups, sel)
+        ia_view = rows_in_group(data["Incident_Apparatus"], ia_groups, sel)
         st.markdown(f"**Personnel on Scene ({len(ip_view)}):**")
         show_person_cols = [c for c in ["Name","Role","Hours","RespondedIn"] if c in ip_view.columns]
         st.dataframe(ip_view[show_person_cols] if not ip_view.empty else ip_view, use_container_width=True, hide_index=True, key="grid_print_personnel")
@@ -612,40 +1220,21 @@ with tabs[5]:
         st.dataframe(ia_view[show_cols] if not ia_view.empty else ia_view, use_container_width=True, hide_index=True, key="grid_print_apparatus")
 
         # --- PRINT / EXPORT CONTROLS (Print tab only) ---
-        import streamlit.components.v1 as components
-        import html as _html
-        import io
-        try:
-            from reportlab.lib.pagesizes import LETTER
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.units import inch
-            _PDF_OK = True
-        except Exception:
-            _PDF_OK = False
 
         # Resolve selected incident record
         try:
-            rec = base[base[PRIMARY_KEY].astype(str) == str(sel)].iloc[0].to_dict()
+            rec = record_for_key(data["Incidents"], inc_pos, sel)
         except Exception:
             rec = {}
 
         # Times
-        times_df = ensure_columns(data.get("Incident_Times", pd.DataFrame()), CHILD_TABLES["Incident_Times"])
-        trow = {}
-        if not times_df.empty:
-            _m = times_df[PRIMARY_KEY].astype(str) == str(sel)
-            if _m.any():
-                trow = times_df[_m].iloc[0].to_dict()
-
-        # Personnel/Apparatus for this incident (fresh views)
-        ip_df = ensure_columns(data.get("Incident_Personnel", pd.DataFrame()), CHILD_TABLES["Incident_Personnel"])
-        ia_df = ensure_columns(data.get("Incident_Apparatus", pd.DataFrame()), CHILD_TABLES["Incident_Apparatus"])
-        ip_view2 = ip_df[ip_df[PRIMARY_KEY].astype(str) == str(sel)]
-        ia_view2 = ia_df[ia_df[PRIMARY_KEY].astype(str) == str(sel)]
-
-        def esc(x): return _html.escape("" if x is None else str(x))
-
-        html_report = f"""
+        times_view = rows_in_group(data["Incident_Times"], times_groups, sel)
+        trow = times_view.iloc[0].to_dict() if not times_view.empty else {}
+
+        # HTML report is built only when the download is clicked (streamlit runs the callable on demand)
+        def build_html_report() -> str:
+            esc = lambda x: _ESC("" if x is None else str(x))
+            return f"""
 <h2>Incident #{esc(sel)}</h2>
 <b>Date/Time:</b> {esc(rec.get('IncidentDate',''))} {esc(rec.get('IncidentTime',''))}<br>
 <b>Location:</b> {esc(rec.get('LocationName',''))} — {esc(rec.get('Address',''))} {esc(rec.get('City',''))} {esc(rec.get('State',''))} {esc(rec.get('PostalCode',''))}<br>
@@ -656,10 +1245,10 @@ with tabs[5]:
 <div style="white-space: pre-wrap;">{esc(rec.get('Narrative',''))}</div>
 <br>
 <h3>Personnel on Scene</h3>
-{ip_view2.to_html(index=False)}
+{table_html(ip_view)}
 <br>
 <h3>Apparatus on Scene</h3>
-{ia_view2.to_html(index=False)}
+{table_html(ia_view)}
 """
 
         c1, c2, c3 = st.columns(3)
@@ -669,63 +1258,53 @@ with tabs[5]:
             components.html("<script>window.print()</script>", height=0, width=0)
 
         # 2) Download HTML (works everywhere)
-        c2.download_button("⬇️ Download HTML", html_report,
+        c2.download_button("⬇️ Download HTML", build_html_report,
                            file_name=f"Incident_{sel}.html", mime="text/html",
                            key=f"print_tab_html_{sel}")
 
         # 3) Optional PDF (requires 'reportlab' in requirements; otherwise this button won't show)
         if _PDF_OK and c3.button("📄 Download PDF", key=f"print_tab_pdf_{sel}"):
             try:
-                buf = io.BytesIO()
-                c = canvas.Canvas(buf, pagesize=LETTER)
-                text = c.beginText(0.5*inch, 10.5*inch)
-                text.setFont("Helvetica", 10)
-                raw = (html_report.replace("<br>", "\n")
-                                  .replace("<h3>", "\n")
-                                  .replace("</h3>", "")
-                                  .replace("<div", "")
-                                  .replace("</div>", ""))
-                for line in raw.split("\n"):
-                    text.textLine(line)
-                c.drawText(text); c.showPage(); c.save()
-                buf.seek(0)
-                st.download_button("Save PDF", data=buf,
+                st.download_button("Save PDF", data=report_pdf(sel, rec, trow, ip_view, ia_view),
                                    file_name=f"Incident_{sel}.pdf", mime="application/pdf",
                                    key=f"print_tab_pdf_dl_{sel}")
             except Exception as e:
                 st.error(f"PDF failed: {e}")
 
 
-with tabs[6]:
+if section == "Export":
     st.header("Export")
     if st.button("Build Excel for Download", key="btn_build_export_auth"):
-        payload = save_workbook_to_bytes(data)
+        payload = export_bytes(data, file_path)
         st.download_button("Download Excel", data=payload, file_name="fire_incident_db_export.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key="download_export_auth")
     if st.button("Overwrite Source File Now", key="btn_overwrite_source_auth"):
-        ok, err = save_to_path(data, file_path)
+        ok, err = save_now(data, file_path)
         if ok: st.success(f"Wrote: {file_path}")
         else: st.error(f"Failed: {err}")
 
-with tabs[7]:
+if section == "Admin":
     st.header("Admin — User Management & Permissions")
-    users_df = apply_role_presets(ensure_columns(data.get("Users", pd.DataFrame()), USERS_SCHEMA))
+    users_df = data["Users"]  # presets already applied at load
+    if not _PW_KEY:
+        st.warning("APP_SECRET is not set: saved passwords are hashed with an unkeyed BLAKE2b digest. "
+                   "Set the APP_SECRET environment variable (and keep it stable) before saving users.")
     users_edit = st.data_editor(users_df, num_rows="dynamic", use_container_width=True, key="editor_users_auth")
     c = st.columns(3)
     if c[0].button("Save Users to Excel", key="save_users_auth"):
-        users_edit = ensure_columns(users_edit, USERS_SCHEMA)
-        ok, err = save_to_path({**data, "Users": users_edit}, file_path)
+        users_edit = seal_passwords(ensure_columns(users_edit, USERS_SCHEMA))
+        ok, err = save_now({**data, "Users": users_edit}, file_path, "Users")
         if ok:
             data["Users"] = users_edit
             st.success("Users saved.")
         else:
             st.error(err)
 
-with tabs[8]:
+if section == "Diagnostics":
     st.header("Diagnostics")
     st.write(f"**App dir:** {os.path.dirname(__file__)}")
     st.write(f"**Excel path:** {file_path}  |  Exists: {'✅' if os.path.exists(file_path) else '❌'}")
     try:
-        xls = pd.ExcelFile(file_path); st.write("**Sheets:**", xls.sheet_names)
+        st.write("**Sheets:**", sheet_names(file_path, file_stamp(file_path)))
     except Exception as e:
         st.error(f"Open failed: {e}")
     st.write("**Personnel Top 10:**")
@@ -733,4 +1312,6 @@ with tabs[8]:
     st.write("**Apparatus Top 10:**")
     st.dataframe(data['Apparatus'].head(10), use_container_width=True)
     st.write("**Users Top 10:**")
-    st.dataframe(data['Users'].head(10), use_container_width=True)
\ No newline at end of file
+    st.dataframe(data['Users'].head(10), use_container_width=True)
+
+flush_autosave(data, file_path)